@@ -6,22 +6,46 @@ Monitors system resources, latency, and throughput during concurrent execution
 
 import os
 import csv
+import asyncio
 import json
 import time
+import logging
 import psutil
+import numpy as np
 import threading
 import argparse
-from datetime import datetime
+import itertools
+import multiprocessing
+import operator
+from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Tuple
 from collections import defaultdict
-from dataclasses import dataclass, asdict
+from queue import SimpleQueue
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, asdict, fields, replace
 import statistics
-from queue import Queue
 
 # Import the process_prompt function from the main script
 import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from rule_processor_v3_script import process_prompt, create_session, run_agent_sse
+from rule_processor_v3_script import (
+    process_prompt, create_session, run_agent_sse,
+    process_prompt_async, AIOHTTP_AVAILABLE
+)
+
+if AIOHTTP_AVAILABLE:
+    import aiohttp
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Tells the results writer thread that no more results are coming
+_WRITER_SENTINEL = object()
 
 # ============================
 # DATA STRUCTURES
@@ -50,6 +74,9 @@ class ResourceSnapshot:
     memory_percent: float
     memory_mb: float
     cpu_count: int
+    peak_cpu_percent: float = 0.0
+    peak_memory_percent: float = 0.0
+    peak_memory_mb: float = 0.0
 
 @dataclass
 class LoadTestSummary:
@@ -73,26 +100,81 @@ class LoadTestSummary:
     avg_memory_mb: float
     max_memory_mb: float
 
+def _as_rows(records: List[Any], record_type: type) -> List[Dict[str, Any]]:
+    """Flatten dataclass records into CSV row dicts (shallow, unlike asdict's deep copy)"""
+    field_names = [f.name for f in fields(record_type)]
+    get_values = operator.attrgetter(*field_names)
+    return [dict(zip(field_names, get_values(record))) for record in records]
+
 # ============================
 # RESOURCE MONITORING
 # ============================
 
 class ResourceMonitor:
-    """Monitors system resources in a background thread"""
+    """
+    Monitors system resources in a background thread
     
-    def __init__(self, interval: float = 1.0):
+    By default one sample is taken every `interval` seconds. With
+    `sampling_window > 0`, `samples_per_window` back-to-back samples are
+    taken over the first `sampling_window` seconds of each interval and
+    recorded as one snapshot (mean values plus peaks), keeping spike
+    detection while the monitor idles for the rest of the interval.
+    
+    With `include_children=True` (used for the process executor) CPU and
+    memory of all child processes are added to this process's figures, so
+    work done in pool workers shows up in the metrics. Memory is then this
+    process's RSS plus each child's USS (memory unique to that child), so
+    pages shared between processes are not counted once per worker.
+    """
+    
+    # Non-blocking cpu_percent() calls closer together than this return 0.0 or
+    # noise (the CPU-time delta is below clock-tick resolution), so reuse the last value
+    MIN_CPU_SAMPLE_SPACING = 0.05
+    
+    def __init__(
+        self,
+        interval: float = 1.0,
+        sampling_window: float = 0.0,
+        samples_per_window: int = 1,
+        include_children: bool = False
+    ):
+        if sampling_window < 0 or sampling_window >= interval:
+            raise ValueError("sampling_window must be >= 0 and shorter than interval")
+        if samples_per_window < 1:
+            raise ValueError("samples_per_window must be at least 1")
+        
         self.interval = interval
+        self.sampling_window = sampling_window
+        self.samples_per_window = samples_per_window if sampling_window > 0 else 1
         self.snapshots: List[ResourceSnapshot] = []
         self.monitoring = False
         self.thread: Optional[threading.Thread] = None
         self.process = psutil.Process()
+        self.cpu_count = psutil.cpu_count()
+        self._total_memory = psutil.virtual_memory().total
+        self.include_children = include_children
+        # Child Process objects are kept across samples: cpu_percent() is a delta
+        # since the previous call on the same object
+        self._children: Dict[int, psutil.Process] = {}
+        
+        # Prime cpu_percent: the first non-blocking call always returns 0.0
+        self.process.cpu_percent(interval=None)
+        self._last_cpu_sample_time = time.monotonic()
+        self._last_cpu_percent = 0.0
         
     def start(self):
         """Start monitoring in background thread"""
         self.monitoring = True
         self.thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.thread.start()
-        print(f"📊 Resource monitoring started (interval: {self.interval}s)")
+        if self.sampling_window > 0:
+            print(f"📊 Resource monitoring started (interval: {self.interval}s, "
+                  f"{self.samples_per_window} samples over {self.sampling_window}s)")
+        else:
+            print(f"📊 Resource monitoring started (interval: {self.interval}s)")
+        if self.include_children:
+            print("📊 Resource metrics include child (pool worker) processes "
+                  "(memory: this process's RSS + each child's USS)")
         
     def stop(self):
         """Stop monitoring"""
@@ -101,22 +183,138 @@ class ResourceMonitor:
             self.thread.join(timeout=5)
         print(f"📊 Resource monitoring stopped ({len(self.snapshots)} snapshots collected)")
         
-    def _monitor_loop(self):
-        """Background monitoring loop"""
-        while self.monitoring:
+    def _pin_monitor_thread(self):
+        """
+        Best-effort (Linux): pin the calling monitor thread to one CPU and raise
+        its priority so busy workers don't starve the sampler. Pid 0 targets
+        only the calling thread. Raising priority needs CAP_SYS_NICE; without
+        it the monitor simply runs at normal priority.
+        """
+        if hasattr(os, "sched_setaffinity"):
             try:
-                snapshot = ResourceSnapshot(
-                    timestamp=datetime.now().isoformat(),
-                    cpu_percent=self.process.cpu_percent(interval=0.1),
-                    memory_percent=self.process.memory_percent(),
-                    memory_mb=self.process.memory_info().rss / (1024 * 1024),
-                    cpu_count=psutil.cpu_count()
-                )
-                self.snapshots.append(snapshot)
-            except Exception as e:
-                print(f"⚠️  Error monitoring resources: {e}")
-            
-            time.sleep(self.interval)
+                os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
+            except OSError:
+                pass
+        try:
+            os.nice(-5)
+        except (OSError, AttributeError):
+            pass
+    
+    def _open_timerfd(self) -> Optional[int]:
+        """Open a periodic CLOCK_MONOTONIC timerfd (Linux, Python 3.13+), or None if unavailable"""
+        if not hasattr(os, "timerfd_create"):
+            return None
+        try:
+            timer_fd = os.timerfd_create(time.CLOCK_MONOTONIC)
+        except OSError:
+            return None
+        try:
+            os.timerfd_settime(timer_fd, initial=self.interval, interval=self.interval)
+        except OSError:
+            os.close(timer_fd)
+            return None
+        return timer_fd
+    
+    def _monitored_processes(self) -> List[psutil.Process]:
+        """This process plus, with include_children, every live child process"""
+        if not self.include_children:
+            return [self.process]
+        
+        try:
+            current = {child.pid: child for child in self.process.children(recursive=True)}
+        except psutil.Error:
+            current = {}
+        for pid, child in current.items():
+            if pid not in self._children:
+                # Prime the new child's cpu_percent (first call always returns 0.0)
+                try:
+                    child.cpu_percent(interval=None)
+                except psutil.Error:
+                    continue
+                self._children[pid] = child
+        for pid in list(self._children):
+            if pid not in current:
+                del self._children[pid]
+        return [self.process] + list(self._children.values())
+    
+    def _sample(self) -> Tuple[float, float, float]:
+        """Take one (cpu_percent, memory_percent, memory_mb) sample of the monitored processes"""
+        now = time.monotonic()
+        read_cpu = now - self._last_cpu_sample_time >= self.MIN_CPU_SAMPLE_SPACING
+        
+        cpu_percent = 0.0
+        memory_bytes = 0
+        for process in self._monitored_processes():
+            try:
+                # oneshot() shares a single /proc read across the calls below
+                with process.oneshot():
+                    if read_cpu:
+                        cpu_percent += process.cpu_percent(interval=None)
+                    if process is self.process:
+                        memory_bytes += process.memory_info().rss
+                    else:
+                        # RSS would re-count shared pages (libraries, copy-on-write) per child
+                        memory_bytes += process.memory_full_info().uss
+            except psutil.Error:
+                # A child exited between listing and sampling
+                if process is self.process:
+                    raise
+        
+        if read_cpu:
+            self._last_cpu_percent = cpu_percent
+            self._last_cpu_sample_time = now
+        # Same definition as psutil's memory_percent(), applied to the combined figure
+        memory_percent = memory_bytes / self._total_memory * 100
+        return self._last_cpu_percent, memory_percent, memory_bytes / (1024 * 1024)
+    
+    def _collect_snapshot(self) -> ResourceSnapshot:
+        """Collect one snapshot, summarising a burst of samples in sampling-window mode"""
+        timestamp = datetime.now().isoformat()
+        samples = [self._sample()]
+        spacing = self.sampling_window / self.samples_per_window
+        for _ in range(self.samples_per_window - 1):
+            time.sleep(spacing)
+            samples.append(self._sample())
+        
+        cpu_values, memory_percent_values, memory_mb_values = zip(*samples)
+        return ResourceSnapshot(
+            timestamp=timestamp,
+            cpu_percent=sum(cpu_values) / len(cpu_values),
+            memory_percent=sum(memory_percent_values) / len(memory_percent_values),
+            memory_mb=sum(memory_mb_values) / len(memory_mb_values),
+            cpu_count=self.cpu_count,
+            peak_cpu_percent=max(cpu_values),
+            peak_memory_percent=max(memory_percent_values),
+            peak_memory_mb=max(memory_mb_values)
+        )
+    
+    def _monitor_loop(self):
+        """Background monitoring loop, sampling on a fixed monotonic schedule"""
+        self._pin_monitor_thread()
+        
+        timer_fd = self._open_timerfd()
+        next_tick = time.monotonic()
+        try:
+            while self.monitoring:
+                try:
+                    self.snapshots.append(self._collect_snapshot())
+                except Exception as e:
+                    print(f"⚠️  Error monitoring resources: {e}")
+                
+                # Wait for the next tick so sample spacing doesn't drift with work time
+                if timer_fd is not None:
+                    os.read(timer_fd, 8)
+                else:
+                    next_tick += self.interval
+                    sleep_for = next_tick - time.monotonic()
+                    if sleep_for > 0:
+                        time.sleep(sleep_for)
+                    else:
+                        # Fell behind; skip missed ticks instead of sampling in a burst
+                        next_tick = time.monotonic()
+        finally:
+            if timer_fd is not None:
+                os.close(timer_fd)
     
     def get_summary_stats(self) -> Dict[str, float]:
         """Get summary statistics of resource usage"""
@@ -129,11 +327,11 @@ class ResourceMonitor:
         
         return {
             'avg_cpu_percent': statistics.mean(cpu_values),
-            'max_cpu_percent': max(cpu_values),
+            'max_cpu_percent': max(s.peak_cpu_percent for s in self.snapshots),
             'avg_memory_percent': statistics.mean(memory_percent_values),
-            'max_memory_percent': max(memory_percent_values),
+            'max_memory_percent': max(s.peak_memory_percent for s in self.snapshots),
             'avg_memory_mb': statistics.mean(memory_mb_values),
-            'max_memory_mb': max(memory_mb_values),
+            'max_memory_mb': max(s.peak_memory_mb for s in self.snapshots),
         }
     
     def save_snapshots(self, filepath: str):
@@ -144,61 +342,150 @@ class ResourceMonitor:
         with open(filepath, 'w', newline='', encoding='utf-8') as f:
             writer = csv.DictWriter(f, fieldnames=[
                 'timestamp', 'cpu_percent', 'memory_percent', 
-                'memory_mb', 'cpu_count'
+                'memory_mb', 'cpu_count', 'peak_cpu_percent',
+                'peak_memory_percent', 'peak_memory_mb'
             ])
             writer.writeheader()
-            for snapshot in self.snapshots:
-                writer.writerow(asdict(snapshot))
+            writer.writerows(_as_rows(self.snapshots, ResourceSnapshot))
         print(f"💾 Resource snapshots saved to {filepath}")
 
 # ============================
 # CONCURRENT EXECUTION FUNCTIONS
 # ============================
 
-def execute_prompt_thread(prompt_id: int, prompt: str, thread_id: int, iteration: int, results_queue: Queue):
+def execute_prompt(prompt_id: int, prompt: str, thread_id: int, iteration: int) -> PromptResult:
     """
-    Execute a single prompt in a thread
-    All threads start simultaneously for true concurrent load testing
+    Execute a single prompt on a pool worker and return its result
+    All requests of an iteration are submitted at once for true concurrent load testing
     """
+    # Latency comes from the monotonic clock so wall-clock jumps can't skew it;
+    # the wall-clock start is kept only for the timestamps in the result record
+    start_ns = time.monotonic_ns()
     start_time = datetime.now()
-    start_timestamp = start_time.isoformat()
     
     try:
         response, status, session_id = process_prompt(prompt)
-        end_time = datetime.now()
-        latency = (end_time - start_time).total_seconds()
-        
-        result = PromptResult(
-            prompt_id=prompt_id,
-            prompt=prompt,
-            response=response,
-            status=status,
-            session_id=session_id,
-            latency_seconds=latency,
-            start_time=start_timestamp,
-            end_time=end_time.isoformat(),
-            worker_id=thread_id,
-            iteration=iteration
-        )
-        results_queue.put(result)
-        
     except Exception as e:
-        end_time = datetime.now()
-        latency = (end_time - start_time).total_seconds()
-        
-        result = PromptResult(
-            prompt_id=prompt_id,
-            prompt=prompt,
-            response=f"ERROR: {str(e)}",
-            status="ERROR",
-            session_id="N/A",
-            latency_seconds=latency,
-            start_time=start_timestamp,
-            end_time=end_time.isoformat(),
-            worker_id=thread_id,
-            iteration=iteration
+        response, status, session_id = f"ERROR: {str(e)}", "ERROR", "N/A"
+    
+    return _build_result(prompt_id, prompt, thread_id, iteration,
+                         response, status, session_id, start_time, start_ns)
+
+async def execute_prompt_async(
+    prompt_id: int,
+    prompt: str,
+    thread_id: int,
+    iteration: int,
+    http: "aiohttp.ClientSession",
+    semaphore: asyncio.Semaphore
+) -> PromptResult:
+    """Coroutine counterpart of execute_prompt for the asyncio executor"""
+    async with semaphore:
+        start_ns = time.monotonic_ns()
+        start_time = datetime.now()
+        
+        try:
+            response, status, session_id = await process_prompt_async(prompt, http)
+        except Exception as e:
+            response, status, session_id = f"ERROR: {str(e)}", "ERROR", "N/A"
+    
+    return _build_result(prompt_id, prompt, thread_id, iteration,
+                         response, status, session_id, start_time, start_ns)
+
+def _build_result(
+    prompt_id: int,
+    prompt: str,
+    thread_id: int,
+    iteration: int,
+    response: str,
+    status: str,
+    session_id: str,
+    start_time: datetime,
+    start_ns: int
+) -> PromptResult:
+    """Build a PromptResult, taking latency from the monotonic start"""
+    latency = (time.monotonic_ns() - start_ns) / 1e9
+    
+    return PromptResult(
+        prompt_id=prompt_id,
+        prompt=prompt,
+        response=response,
+        status=status,
+        session_id=session_id,
+        latency_seconds=latency,
+        start_time=start_time.isoformat(),
+        end_time=(start_time + timedelta(seconds=latency)).isoformat(),
+        worker_id=thread_id,
+        iteration=iteration
+    )
+
+def read_prompts(input_file: str, max_prompts: Optional[int] = None) -> List[Tuple[int, str]]:
+    """Read (prompt_id, prompt) pairs from a CSV file, streaming rows and stopping at max_prompts"""
+    prompts = []
+    with open(input_file, encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"{input_file} is empty; expected a header row")
+        prompt_col = next(
+            (i for i, c in enumerate(header) if c.lower() in ("prompt", "prompts", "input")), None
         )
-        results_queue.put(result)
+        if prompt_col is None:
+            raise ValueError(
+                f"{input_file} has no prompt column; expected one of 'prompt', 'prompts', 'input' "
+                f"(found: {', '.join(header) or 'none'})"
+            )
+        
+        idx = 0
+        for row in reader:
+            # Blank lines are not data rows (matches csv.DictReader numbering)
+            if not row:
+                continue
+            idx += 1
+            prompt = row[prompt_col].strip() if prompt_col < len(row) else ""
+            if prompt:
+                prompts.append((idx, prompt))
+                if max_prompts and len(prompts) >= max_prompts:
+                    break
+    
+    return prompts
+
+def recommended_max_workers(prompt_count: int, executor: str = "thread") -> int:
+    """
+    Heuristic worker count for --workers auto
+    I/O-bound threads: up to 8 per logical CPU; CPU-bound processes: one per CPU.
+    Never more than the number of distinct prompts available.
+    """
+    cpu_count = psutil.cpu_count(logical=True) or 1
+    per_cpu = 1 if executor == "process" else 8
+    return max(1, min(prompt_count, cpu_count * per_cpu))
+
+def _terminate_child_processes(timeout: float = 1.0):
+    """Terminate (then kill, after `timeout` seconds) every child process, e.g. process pool workers"""
+    children = psutil.Process().children(recursive=True)
+    for child in children:
+        try:
+            child.terminate()
+        except psutil.Error:
+            pass
+    _, alive = psutil.wait_procs(children, timeout=timeout)
+    for child in alive:
+        try:
+            child.kill()
+        except psutil.Error:
+            pass
+
+def _workers_arg(value: str):
+    """argparse type for --workers: a positive integer, or 'auto' / 0 for the heuristic"""
+    if value.lower() == "auto":
+        return "auto"
+    try:
+        workers = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an integer or 'auto', got {value!r}")
+    if workers < 0:
+        raise argparse.ArgumentTypeError("workers must not be negative")
+    return "auto" if workers == 0 else workers
 
 # ============================
 # LOAD TEST ORCHESTRATOR
@@ -207,6 +494,12 @@ def execute_prompt_thread(prompt_id: int, prompt: str, thread_id: int, iteration
 class LoadTestOrchestrator:
     """Orchestrates load testing with multiple workers"""
     
+    # Flush the streamed results CSV at least this often (and at the end of every iteration)
+    RESULTS_FLUSH_EVERY = 100
+    
+    # Minimum seconds between progress log lines while requests are completing
+    PROGRESS_LOG_INTERVAL = 1.0
+    
     def __init__(
         self,
         input_file: str,
@@ -214,7 +507,10 @@ class LoadTestOrchestrator:
         concurrent_workers: int = 2,
         max_prompts: Optional[int] = None,
         iterations: int = 1,
-        resource_monitor_interval: float = 1.0
+        resource_monitor_interval: float = 1.0,
+        resource_sampling_window: float = 0.0,
+        resource_samples_per_window: int = 1,
+        executor: str = "thread"
     ):
         self.input_file = input_file
         self.output_dir = output_dir
@@ -222,32 +518,67 @@ class LoadTestOrchestrator:
         self.max_prompts = max_prompts
         self.iterations = iterations
         self.resource_monitor_interval = resource_monitor_interval
+        self.executor_type = executor
         
         # Create output directory
         os.makedirs(output_dir, exist_ok=True)
         
         # Initialize monitor
-        self.monitor = ResourceMonitor(interval=resource_monitor_interval)
+        self.monitor = ResourceMonitor(
+            interval=resource_monitor_interval,
+            sampling_window=resource_sampling_window,
+            samples_per_window=resource_samples_per_window,
+            # Process-pool work runs in child processes; sample them too
+            include_children=(executor == "process")
+        )
+        
+        # Persistent worker pool (or event loop for asyncio) reused across all
+        # iterations; created by run_load_test once there are prompts to run
+        self._executor: Optional[Executor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._http: Optional["aiohttp.ClientSession"] = None
+        
+        # Request schedule: prompts cycled to cover every request of every iteration
+        self._schedule: List[Tuple[int, str]] = []
         
-        # Results storage
+        # Results storage: a writer thread streams rows to the results CSV as they
+        # finish; self.results keeps them without response bodies for the summary
         self.results: List[PromptResult] = []
+        self._timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._results_path = os.path.join(self.output_dir, f"results_{self._timestamp}.csv")
+        self._writer_q: SimpleQueue = SimpleQueue()
+        self._writer_thread: Optional[threading.Thread] = None
         
+    def _create_executor(self) -> Optional[Executor]:
+        """
+        Create the worker pool
+        Threads suit the I/O-bound default; processes sidestep the GIL when
+        process_prompt turns out to be CPU-bound. The asyncio executor needs
+        no pool: requests run as coroutines on a single event loop.
+        """
+        if self.executor_type == "asyncio":
+            if not AIOHTTP_AVAILABLE:
+                raise RuntimeError("asyncio executor requires aiohttp. Install with: pip install aiohttp")
+            return None
+        if self.executor_type == "process":
+            # Never fork: workers start on the first submit, when the monitor and
+            # writer threads are already running, and a forked child can inherit
+            # a lock (logging, stdout, psutil) another thread was holding
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            return ProcessPoolExecutor(
+                max_workers=self.concurrent_workers,
+                mp_context=multiprocessing.get_context(start_method)
+            )
+        if self.executor_type == "thread":
+            return ThreadPoolExecutor(
+                max_workers=self.concurrent_workers,
+                thread_name_prefix="loadtest"
+            )
+        raise ValueError(f"Unknown executor type: {self.executor_type!r}")
+    
     def load_prompts(self) -> List[Tuple[int, str]]:
         """Load prompts from CSV file"""
-        with open(self.input_file, encoding='utf-8') as f:
-            rows = list(csv.DictReader(f))
-        
-        prompt_col = next(c for c in rows[0] if c.lower() in ("prompt", "prompts", "input"))
-        
-        prompts = []
-        for idx, row in enumerate(rows, 1):
-            prompt = row.get(prompt_col, "").strip()
-            if prompt:
-                prompts.append((idx, prompt))
-                if self.max_prompts and len(prompts) >= self.max_prompts:
-                    break
-        
-        return prompts
+        return read_prompts(self.input_file, self.max_prompts)
     
     def run_load_test(self) -> LoadTestSummary:
         """Execute load test with truly concurrent execution and iterations"""
@@ -257,6 +588,7 @@ class LoadTestOrchestrator:
         print(f"📁 Input file: {self.input_file}")
         print(f"🔥 Concurrent requests per iteration: {self.concurrent_workers}")
         print(f"🔁 Iterations: {self.iterations}")
+        print(f"🧵 Executor: {self.executor_type}")
         print(f"📊 Total requests: {self.concurrent_workers * self.iterations}")
         print(f"💻 CPU cores available: {psutil.cpu_count()}")
         print(f"📊 Resource monitoring interval: {self.resource_monitor_interval}s")
@@ -266,94 +598,91 @@ class LoadTestOrchestrator:
         prompts = self.load_prompts()
         print(f"📋 Loaded {len(prompts)} prompts from {self.input_file}\n")
         
+        # Nothing to schedule: cycling an empty list would leave every result slot empty
+        if not prompts:
+            print(f"❌ No prompts found in {self.input_file}; nothing to run\n")
+            self.results = []
+            summary = self._generate_summary(0.0)
+            self._save_results(summary)
+            return summary
+        
         # Calculate total prompts needed
         total_prompts_needed = self.concurrent_workers * self.iterations
         if len(prompts) < total_prompts_needed:
             print(f"⚠️  Warning: Only {len(prompts)} prompts available, need {total_prompts_needed}")
             print(f"   Will cycle through prompts to complete all iterations\n")
         
+        # Precompute the full schedule once instead of re-indexing every iteration
+        self._schedule = list(itertools.islice(itertools.cycle(prompts), total_prompts_needed))
+        
+        # One result slot per scheduled request, filled in as requests finish,
+        # so results come out in (iteration, submission) order without sorting
+        self.results = [None] * total_prompts_needed
+        
+        # Created only now so the early return above has no pool or loop to release
+        self._executor = self._create_executor()
+        if self._executor is None:
+            self._loop = asyncio.new_event_loop()
+        
         # Start resource monitoring
         self.monitor.start()
         test_start_time = time.time()
         
-        # Create results queue for thread-safe result collection
-        results_queue = Queue()
-        
-        # Run iterations
-        for iteration in range(1, self.iterations + 1):
-            print("\n" + "="*80)
-            print(f"🔁 ITERATION {iteration}/{self.iterations}")
-            print("="*80)
-            
-            # Calculate prompt indices for this iteration
-            start_idx = (iteration - 1) * self.concurrent_workers
-            end_idx = start_idx + self.concurrent_workers
-            
-            # Get prompts for this iteration (cycle if necessary)
-            prompts_for_iteration = []
-            for i in range(start_idx, end_idx):
-                prompt_idx = i % len(prompts)
-                prompts_for_iteration.append(prompts[prompt_idx])
-            
-            print(f"🔥 Launching {len(prompts_for_iteration)} requests SIMULTANEOUSLY...\n")
-            
-            # Create and start all threads simultaneously
-            threads = []
-            thread_start_time = time.time()
-            
-            for idx, (prompt_id, prompt) in enumerate(prompts_for_iteration):
-                thread = threading.Thread(
-                    target=execute_prompt_thread,
-                    args=(prompt_id, prompt, idx, iteration, results_queue),
-                    daemon=True
-                )
-                threads.append(thread)
-            
-            # Start all threads at once for true concurrent load
-            print(f"⚡ Starting all {len(threads)} requests simultaneously...")
-            for thread in threads:
-                thread.start()
-            
-            launch_time = time.time() - thread_start_time
-            print(f"✅ All {len(threads)} requests launched in {launch_time:.3f}s\n")
-            print(f"⏳ Waiting for all requests to complete...\n")
-            
-            # Wait for all threads to complete and show progress
-            completed = 0
-            for thread in threads:
-                thread.join()
-                completed += 1
-                if completed % 5 == 0 or completed == len(threads):
-                    print(f"   [{completed}/{len(threads)}] requests completed...")
-            
-            iteration_time = time.time() - thread_start_time
-            print(f"\n✅ Iteration {iteration} completed in {iteration_time:.2f}s")
-            
-            # Small delay between iterations (optional, can be made configurable)
-            if iteration < self.iterations:
-                print(f"   ⏸  Preparing for next iteration...\n")
-                time.sleep(0.5)
+        self._start_results_writer()
+        try:
+            # Run iterations
+            for iteration in range(1, self.iterations + 1):
+                print("\n" + "="*80)
+                print(f"🔁 ITERATION {iteration}/{self.iterations}")
+                print("="*80)
+                
+                # Calculate prompt indices for this iteration
+                start_idx = (iteration - 1) * self.concurrent_workers
+                end_idx = start_idx + self.concurrent_workers
+                
+                prompts_for_iteration = self._schedule[start_idx:end_idx]
+                
+                print(f"🔥 Launching {len(prompts_for_iteration)} requests SIMULTANEOUSLY...\n")
+                
+                wave_start_time = time.time()
+                if self._executor is None:
+                    self._loop.run_until_complete(self._run_wave_async(prompts_for_iteration, iteration))
+                else:
+                    self._run_wave(prompts_for_iteration, iteration)
+                
+                # Let the writer catch up so its progress lines come before the banner
+                self._wait_for_writer()
+                iteration_time = time.time() - wave_start_time
+                print(f"\n✅ Iteration {iteration} completed in {iteration_time:.2f}s")
+                
+                # Small delay between iterations (optional, can be made configurable)
+                if iteration < self.iterations:
+                    print(f"   ⏸  Preparing for next iteration...\n")
+                    time.sleep(0.5)
+        finally:
+            self._stop_results_writer()
+            if self._executor is not None:
+                # Cancel queued requests and return without waiting for in-flight
+                # ones. Pool threads are non-daemon, so the interpreter still joins
+                # them at exit; main() exits hard on Ctrl-C to avoid that wait.
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            else:
+                if self._http is not None:
+                    self._loop.run_until_complete(self._http.close())
+                self._loop.close()
         
         # Stop monitoring
         test_end_time = time.time()
         self.monitor.stop()
         
-        # Collect results from queue
-        while not results_queue.empty():
-            result = results_queue.get()
-            self.results.append(result)
-        
-        # Sort results by iteration then prompt_id for consistent output
-        self.results.sort(key=lambda x: (x.iteration, x.prompt_id))
-        
         # Print individual results grouped by iteration
         print("\n" + "="*80)
         print("📊 INDIVIDUAL RESULTS")
         print("="*80)
         for iteration in range(1, self.iterations + 1):
             print(f"\n--- Iteration {iteration} ---")
-            iteration_results = [r for r in self.results if r.iteration == iteration]
-            for result in iteration_results:
+            start_idx = (iteration - 1) * self.concurrent_workers
+            for result in self.results[start_idx:start_idx + self.concurrent_workers]:
                 status_emoji = "✅" if result.status == "PASS" else "❌"
                 print(f"{status_emoji} Prompt {result.prompt_id} | "
                       f"Thread {result.worker_id} | "
@@ -366,17 +695,150 @@ class LoadTestOrchestrator:
         summary = self._generate_summary(total_duration)
         
         # Save results
-        self._save_results()
+        self._save_results(summary)
         
         return summary
     
+    def _run_wave(self, prompts_for_iteration: List[Tuple[int, str]], iteration: int):
+        """Submit one iteration's requests to the pool and collect their results"""
+        # Submit all requests to the pool at once for true concurrent load
+        submit_start_time = time.time()
+        futures = [
+            self._executor.submit(execute_prompt, prompt_id, prompt, idx, iteration)
+            for idx, (prompt_id, prompt) in enumerate(prompts_for_iteration)
+        ]
+        
+        launch_time = time.time() - submit_start_time
+        print(f"✅ All {len(futures)} requests launched in {launch_time:.3f}s\n")
+        print(f"⏳ Waiting for all requests to complete...\n")
+        
+        # Collect results as they finish and show progress
+        for completed, future in enumerate(as_completed(futures), 1):
+            self._record_result(future.result(), completed, len(futures))
+    
+    async def _run_wave_async(self, prompts_for_iteration: List[Tuple[int, str]], iteration: int):
+        """Run one iteration's requests as coroutines sharing one aiohttp session"""
+        if self._http is None:
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrent_workers)
+            )
+        semaphore = asyncio.Semaphore(self.concurrent_workers)
+        
+        submit_start_time = time.time()
+        tasks = [
+            asyncio.ensure_future(
+                execute_prompt_async(prompt_id, prompt, idx, iteration, self._http, semaphore)
+            )
+            for idx, (prompt_id, prompt) in enumerate(prompts_for_iteration)
+        ]
+        
+        launch_time = time.time() - submit_start_time
+        print(f"✅ All {len(tasks)} requests launched in {launch_time:.3f}s\n")
+        print(f"⏳ Waiting for all requests to complete...\n")
+        
+        for completed, next_done in enumerate(asyncio.as_completed(tasks), 1):
+            self._record_result(await next_done, completed, len(tasks))
+    
+    def _start_results_writer(self):
+        """Start the thread that streams finished results to the detailed results CSV"""
+        self._writer_thread = threading.Thread(
+            target=self._writer_loop,
+            args=(self._writer_q, self._results_path),
+            name="loadtest-writer",
+            daemon=True
+        )
+        self._writer_thread.start()
+    
+    def _stop_results_writer(self):
+        """Let the writer drain everything queued so far, then wait for it to close the file"""
+        if self._writer_thread is not None:
+            self._writer_q.put(_WRITER_SENTINEL)
+            self._writer_thread.join()
+            self._writer_thread = None
+    
+    def _wait_for_writer(self):
+        """Block until the writer thread has written and logged everything queued so far"""
+        barrier = threading.Event()
+        self._writer_q.put(barrier)
+        barrier.wait()
+    
+    def _writer_loop(self, writer_q: SimpleQueue, results_path: str):
+        """
+        Writer thread: append each queued result to CSV and log all progress
+        lines, so file I/O and console output never delay result collection
+        """
+        last_progress_log = 0.0
+        rows_since_flush = 0
+        f = None
+        writer = None
+        # Row builder made once here rather than per row via _as_rows
+        field_names = [field.name for field in fields(PromptResult)]
+        get_values = operator.attrgetter(*field_names)
+        
+        try:
+            while True:
+                item = writer_q.get()
+                if item is _WRITER_SENTINEL:
+                    break
+                if isinstance(item, threading.Event):
+                    # Barrier from _wait_for_writer: everything before it is done
+                    item.set()
+                    continue
+                result, completed, total = item
+                
+                try:
+                    if f is None:
+                        # Opened on the first result so empty runs leave no file behind
+                        f = open(results_path, 'w', newline='', encoding='utf-8')
+                        writer = csv.DictWriter(f, fieldnames=[
+                            'iteration', 'prompt_id', 'prompt', 'response', 'status', 'session_id',
+                            'latency_seconds', 'start_time', 'end_time', 'worker_id', 'iterations_count'
+                        ])
+                        writer.writeheader()
+                    writer.writerow(dict(zip(field_names, get_values(result))))
+                    rows_since_flush += 1
+                    if rows_since_flush >= self.RESULTS_FLUSH_EVERY or completed == total:
+                        f.flush()
+                        rows_since_flush = 0
+                except Exception as e:
+                    print(f"⚠️  Error writing result for prompt {result.prompt_id}: {e}")
+                
+                # Throttled, lazily formatted progress; the last line of each
+                # iteration is always logged
+                now = time.monotonic()
+                if completed == total or now - last_progress_log >= self.PROGRESS_LOG_INTERVAL:
+                    last_progress_log = now
+                    logger.info("   [%d/%d] requests completed...", completed, total)
+        finally:
+            if f is not None:
+                f.close()
+    
+    def _record_result(self, result: PromptResult, completed: int, total: int):
+        """Keep a finished request's result in its schedule slot and hand it to the writer thread"""
+        self._writer_q.put((result, completed, total))
+        
+        # The writer owns the full result; don't hold the response body here
+        slot = (result.iteration - 1) * self.concurrent_workers + result.worker_id
+        self.results[slot] = replace(result, response="")
+    
     def _generate_summary(self, total_duration: float) -> LoadTestSummary:
-        """Generate test summary statistics"""
-        successful = [r for r in self.results if r.status == "PASS"]
-        failed = [r for r in self.results if r.status != "PASS"]
+        """Generate test summary statistics with vectorized numpy reductions"""
+        successful_count = sum(1 for r in self.results if r.status == "PASS")
         
-        latencies = [r.latency_seconds for r in self.results]
-        latencies.sort()
+        n = len(self.results)
+        if n:
+            latencies = np.fromiter((r.latency_seconds for r in self.results), dtype=np.float64, count=n)
+            # partition is O(n): only the p95/p99 positions need to land in place
+            p95_idx, p99_idx = int(n * 0.95), int(n * 0.99)
+            partitioned = np.partition(latencies, [p95_idx, p99_idx])
+            p95_latency = float(partitioned[p95_idx])
+            p99_latency = float(partitioned[p99_idx])
+            avg_latency = float(latencies.mean())
+            median_latency = float(np.median(latencies))
+            min_latency = float(latencies.min())
+            max_latency = float(latencies.max())
+        else:
+            avg_latency = median_latency = min_latency = max_latency = p95_latency = p99_latency = 0
         
         resource_stats = self.monitor.get_summary_stats()
         
@@ -384,14 +846,14 @@ class LoadTestOrchestrator:
             total_prompts=len(self.results),
             concurrent_workers=self.concurrent_workers,
             total_duration_seconds=total_duration,
-            successful_prompts=len(successful),
-            failed_prompts=len(failed),
-            avg_latency_seconds=statistics.mean(latencies) if latencies else 0,
-            median_latency_seconds=statistics.median(latencies) if latencies else 0,
-            min_latency_seconds=min(latencies) if latencies else 0,
-            max_latency_seconds=max(latencies) if latencies else 0,
-            p95_latency_seconds=latencies[int(len(latencies) * 0.95)] if latencies else 0,
-            p99_latency_seconds=latencies[int(len(latencies) * 0.99)] if latencies else 0,
+            successful_prompts=successful_count,
+            failed_prompts=n - successful_count,
+            avg_latency_seconds=avg_latency,
+            median_latency_seconds=median_latency,
+            min_latency_seconds=min_latency,
+            max_latency_seconds=max_latency,
+            p95_latency_seconds=p95_latency,
+            p99_latency_seconds=p99_latency,
             throughput_per_second=len(self.results) / total_duration if total_duration > 0 else 0,
             avg_cpu_percent=resource_stats.get('avg_cpu_percent', 0),
             max_cpu_percent=resource_stats.get('max_cpu_percent', 0),
@@ -403,21 +865,16 @@ class LoadTestOrchestrator:
         
         return summary
     
-    def _save_results(self):
-        """Save all results to files"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    def _save_results(self, summary: LoadTestSummary):
+        """Save resource snapshots and summary next to the streamed results"""
+        if not self.results:
+            print("\n⚠️  No results collected; nothing to save")
+            return
         
-        # Save detailed results
-        results_file = os.path.join(self.output_dir, f"results_{timestamp}.csv")
-        with open(results_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=[
-                'iteration', 'prompt_id', 'prompt', 'response', 'status', 'session_id',
-                'latency_seconds', 'start_time', 'end_time', 'worker_id', 'iterations_count'
-            ])
-            writer.writeheader()
-            for result in self.results:
-                writer.writerow(asdict(result))
-        print(f"\n💾 Detailed results saved to {results_file}")
+        timestamp = self._timestamp
+        
+        # Detailed results were streamed during the run
+        print(f"\n💾 Detailed results saved to {self._results_path}")
         
         # Save resource snapshots
         resource_file = os.path.join(self.output_dir, f"resources_{timestamp}.csv")
@@ -425,15 +882,21 @@ class LoadTestOrchestrator:
         
         # Save summary
         summary_file = os.path.join(self.output_dir, f"summary_{timestamp}.json")
-        summary = self._generate_summary(
-            sum(r.latency_seconds for r in self.results)
-        )
-        with open(summary_file, 'w', encoding='utf-8') as f:
-            json.dump(asdict(summary), f, indent=2)
+        if ORJSON_AVAILABLE:
+            # orjson serializes dataclasses natively and writes bytes directly
+            with open(summary_file, 'wb') as f:
+                f.write(orjson.dumps(summary, option=orjson.OPT_INDENT_2))
+        else:
+            with open(summary_file, 'w', encoding='utf-8') as f:
+                json.dump(asdict(summary), f, indent=2)
         print(f"💾 Summary saved to {summary_file}")
     
     def print_summary(self, summary: LoadTestSummary):
         """Print formatted summary to console"""
+        if not summary.total_prompts:
+            print("\n⚠️  No prompts were processed; no summary to show\n")
+            return
+        
         print("\n" + "="*80)
         print("📊 LOAD TEST SUMMARY - CONCURRENT LOAD")
         print("="*80)
@@ -486,14 +949,24 @@ Examples:
   
   # Light test
   python load_test_wrapper.py -w 5 -i 2
+  
+  # Size workers from prompt count and CPU cores
+  python load_test_wrapper.py --workers auto
+  
+  # Process pool instead of threads (CPU-bound process_prompt)
+  python load_test_wrapper.py --executor process
+  
+  # Single-threaded asyncio + aiohttp (network-bound, high concurrency)
+  python load_test_wrapper.py --executor asyncio -w 200
         """
     )
     
     parser.add_argument(
         '-w', '--workers',
-        type=int,
+        type=_workers_arg,
         default=20,
-        help='Number of concurrent requests per iteration (default: 20)'
+        help="Number of concurrent requests per iteration, or 'auto' (or 0) to size "
+             "from the prompt count and CPU cores (default: 20)"
     )
     
     parser.add_argument(
@@ -517,8 +990,18 @@ Examples:
         help='Output directory for results (default: load_test_results)'
     )
     
+    parser.add_argument(
+        '-e', '--executor',
+        choices=['thread', 'process', 'asyncio'],
+        default='thread',
+        help='Worker pool type; process if process_prompt is CPU-bound, asyncio (needs aiohttp) '
+             'for large network-bound concurrency (default: thread)'
+    )
+    
     args = parser.parse_args()
     
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", stream=sys.stdout)
+    
     # ============================
     # LOAD TEST CONFIGURATION
     # ============================
@@ -530,50 +1013,76 @@ Examples:
     # Concurrency Settings - SIMULTANEOUS CONCURRENT REQUESTS WITH ITERATIONS
     CONCURRENT_WORKERS = args.workers
     ITERATIONS = args.iterations
+    EXECUTOR = args.executor
     MAX_PROMPTS = None       # Not used - uses CONCURRENT_WORKERS × ITERATIONS prompts
     
     # Monitoring Settings
     RESOURCE_MONITOR_INTERVAL = 1.0  # Check resources every 1 second
+    RESOURCE_SAMPLING_WINDOW = 0.0   # >0: burst-sample during the first N seconds of each interval
+    RESOURCE_SAMPLES_PER_WINDOW = 1  # Samples taken per sampling window
     
     # ============================
     
-    print("\n" + "="*80)
-    print("🔬 TRUE CONCURRENT LOAD TESTING WITH ITERATIONS")
-    print("="*80)
-    print(f"Configuration:")
-    print(f"  Input: {INPUT_FILE}")
-    print(f"  Output: {OUTPUT_DIR}/")
-    print(f"  Concurrent Requests per Iteration: {CONCURRENT_WORKERS}")
-    print(f"  Iterations: {ITERATIONS}")
-    print(f"  Total Requests: {CONCURRENT_WORKERS * ITERATIONS}")
-    print(f"  Test Mode: {ITERATIONS} waves of {CONCURRENT_WORKERS} concurrent requests")
-    print("="*80 + "\n")
-    
-    # Initialize and run load test
-    orchestrator = LoadTestOrchestrator(
-        input_file=INPUT_FILE,
-        output_dir=OUTPUT_DIR,
-        concurrent_workers=CONCURRENT_WORKERS,
-        max_prompts=MAX_PROMPTS,
-        iterations=ITERATIONS,
-        resource_monitor_interval=RESOURCE_MONITOR_INTERVAL
-    )
-    
+    orchestrator = None
     try:
+        # Inside the try so a missing or malformed input file reports as a failed run
+        if CONCURRENT_WORKERS == "auto":
+            CONCURRENT_WORKERS = recommended_max_workers(len(read_prompts(INPUT_FILE)), EXECUTOR)
+        
+        print("\n" + "="*80)
+        print("🔬 TRUE CONCURRENT LOAD TESTING WITH ITERATIONS")
+        print("="*80)
+        print(f"Configuration:")
+        print(f"  Input: {INPUT_FILE}")
+        print(f"  Output: {OUTPUT_DIR}/")
+        print(f"  Concurrent Requests per Iteration: {CONCURRENT_WORKERS}")
+        print(f"  Iterations: {ITERATIONS}")
+        print(f"  Executor: {EXECUTOR}")
+        print(f"  Total Requests: {CONCURRENT_WORKERS * ITERATIONS}")
+        print(f"  Test Mode: {ITERATIONS} waves of {CONCURRENT_WORKERS} concurrent requests")
+        print("="*80 + "\n")
+        
+        # Initialize and run load test
+        orchestrator = LoadTestOrchestrator(
+            input_file=INPUT_FILE,
+            output_dir=OUTPUT_DIR,
+            concurrent_workers=CONCURRENT_WORKERS,
+            max_prompts=MAX_PROMPTS,
+            iterations=ITERATIONS,
+            resource_monitor_interval=RESOURCE_MONITOR_INTERVAL,
+            resource_sampling_window=RESOURCE_SAMPLING_WINDOW,
+            resource_samples_per_window=RESOURCE_SAMPLES_PER_WINDOW,
+            executor=EXECUTOR
+        )
+        
         summary = orchestrator.run_load_test()
         orchestrator.print_summary(summary)
         
-        print("✅ Load test completed successfully!")
-        print(f"📂 Results saved in: {OUTPUT_DIR}/")
+        if summary.total_prompts:
+            print("✅ Load test completed successfully!")
+            print(f"📂 Results saved in: {OUTPUT_DIR}/")
+        else:
+            print("⚠️  Load test finished without processing any prompts; no result files written")
         
     except KeyboardInterrupt:
         print("\n\n⚠️  Load test interrupted by user")
-        orchestrator.monitor.stop()
+        if orchestrator is not None:
+            orchestrator.monitor.stop()
+        # In-flight requests keep running on non-daemon pool threads (up to
+        # 120s per call), and the interpreter would join them at exit; the
+        # rows already streamed to the results CSV are closed, so exit now.
+        # os._exit skips the process pool's cleanup and a SIGINT sent only to
+        # this PID never reaches pool workers, so stop them first
+        _terminate_child_processes()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(130)
     except Exception as e:
         print(f"\n\n❌ Load test failed: {e}")
         import traceback
         traceback.print_exc()
-        orchestrator.monitor.stop()
+        if orchestrator is not None:
+            orchestrator.monitor.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
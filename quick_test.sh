@@ -34,6 +34,12 @@ if [ $? -ne 0 ]; then
     pip install requests
 fi
 
+python3 -c "import numpy" 2>/dev/null
+if [ $? -ne 0 ]; then
+    echo "⚠️  Installing numpy..."
+    pip install numpy
+fi
+
 echo "✅ Dependencies OK"
 echo ""
 
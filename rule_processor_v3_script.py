@@ -258,9 +258,16 @@ import re
 import csv
 import json
 import requests
+import threading
 import traceback
 from typing import Optional, Tuple, Any, List
 
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
 # ============================
 # CONFIGURATION
 # ============================
@@ -345,9 +352,22 @@ def enrich_user_input_action(obj: Any) -> Any:
 # API CALLS
 # ============================
 
+_HTTP = threading.local()
+
+def get_http_session() -> requests.Session:
+    """
+    Per-thread requests.Session so each worker reuses its keep-alive
+    connection (no new TCP/TLS handshake per call). Thread-local because
+    requests.Session is not guaranteed to be thread-safe.
+    """
+    http = getattr(_HTTP, "session", None)
+    if http is None:
+        http = _HTTP.session = requests.Session()
+    return http
+
 def create_session() -> Optional[str]:
     url = f"{BASE_URL}/api/projects/{PROJECT_ID}/agents/{AGENT_ID}/sessions"
-    r = requests.post(url, headers=HEADERS, json={}, timeout=30)
+    r = get_http_session().post(url, headers=HEADERS, json={}, timeout=30)
     r.raise_for_status()
     data = r.json()
     return data.get("sessionId") or data.get("id") or data.get("data", {}).get("sessionId")
@@ -369,30 +389,79 @@ def run_agent_sse(session_id: str, prompt: str) -> Tuple[Optional[Any], Optional
 
     collected_texts = []
 
-    with requests.post(url, headers=headers, json=payload, stream=True, timeout=120) as resp:
+    with get_http_session().post(url, headers=headers, json=payload, stream=True, timeout=120) as resp:
         resp.raise_for_status()
         for line in resp.iter_lines(decode_unicode=True):
-            if not line or "data:" not in line:
-                continue
-            data = line.replace("data:", "").strip()
-            print("RAW SSE LINE:", line)
-            if data == "[DONE]":
-                continue
-            try:
-                chunk = json.loads(data)
-            except Exception:
-                continue
-            print("PARSED SSE CHUNK:", json.dumps(chunk, indent=2))
-            if isinstance(chunk, dict):
-                for k in ("text", "content", "message", "finalResponse", "result"):
-                    val = chunk.get(k)
-                    if isinstance(val, str):
-                        collected_texts.append(val)
-                    elif isinstance(val, dict):
-                        parts = val.get("parts", [])
-                        for p in parts:
-                            if isinstance(p, dict) and "text" in p:
-                                collected_texts.append(p["text"])
+            collected_texts.extend(parse_sse_line(line))
+
+    raw_text = collected_texts[-1] if collected_texts else None
+    parsed_json = find_json_in_text(raw_text) if raw_text else None
+    return parsed_json, raw_text
+
+def parse_sse_line(line: str) -> List[str]:
+    """Extract the text parts carried by one SSE line (empty if none)"""
+    texts = []
+    if not line or "data:" not in line:
+        return texts
+    data = line.replace("data:", "").strip()
+    print("RAW SSE LINE:", line)
+    if data == "[DONE]":
+        return texts
+    try:
+        chunk = json.loads(data)
+    except Exception:
+        return texts
+    print("PARSED SSE CHUNK:", json.dumps(chunk, indent=2))
+    if isinstance(chunk, dict):
+        for k in ("text", "content", "message", "finalResponse", "result"):
+            val = chunk.get(k)
+            if isinstance(val, str):
+                texts.append(val)
+            elif isinstance(val, dict):
+                parts = val.get("parts", [])
+                for p in parts:
+                    if isinstance(p, dict) and "text" in p:
+                        texts.append(p["text"])
+    return texts
+
+# ============================
+# ASYNC API CALLS (aiohttp)
+# ============================
+
+async def create_session_async(http: "aiohttp.ClientSession") -> Optional[str]:
+    url = f"{BASE_URL}/api/projects/{PROJECT_ID}/agents/{AGENT_ID}/sessions"
+    # Same semantics as requests' timeout=30: connect/read inactivity, no total cap
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30)
+    async with http.post(url, headers=HEADERS, json={}, timeout=timeout) as r:
+        r.raise_for_status()
+        data = await r.json(content_type=None)
+    return data.get("sessionId") or data.get("id") or data.get("data", {}).get("sessionId")
+
+async def run_agent_sse_async(http: "aiohttp.ClientSession", session_id: str, prompt: str) -> Tuple[Optional[Any], Optional[str]]:
+    url = f"{BASE_URL}/api/projects/{PROJECT_ID}/agents/{AGENT_ID}/run_sse"
+    payload = {
+        "appName": APP_NAME,
+        "userId": USER_ID,
+        "sessionId": session_id,
+        "newMessage": {
+            "role": "user",
+            "parts": [{"text": prompt}]
+        }
+    }
+
+    headers = HEADERS.copy()
+    headers["accept"] = "text/event-stream"
+
+    collected_texts = []
+
+    # Same semantics as requests' timeout=120: a long stream is fine as long as
+    # data keeps arriving; only connect/read inactivity times out
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=120, sock_read=120)
+    async with http.post(url, headers=headers, json=payload, timeout=timeout) as resp:
+        resp.raise_for_status()
+        async for raw_line in resp.content:
+            line = raw_line.decode("utf-8", errors="replace").rstrip("\r\n")
+            collected_texts.extend(parse_sse_line(line))
 
     raw_text = collected_texts[-1] if collected_texts else None
     parsed_json = find_json_in_text(raw_text) if raw_text else None
@@ -412,25 +481,52 @@ def process_prompt(prompt: str, max_loops: int = 20) -> Tuple[str, str, str]:
         print(f"  🔁 Iteration {i+1}")
         parsed_json, raw_text = run_agent_sse(session_id, current_prompt)
 
-        # CASE A → user_input → enrich & resend
-        if is_user_input_action(parsed_json):
-            print("  🔁 action=user_input → enriching & resending to agent")
+        next_prompt, final_response = handle_agent_reply(parsed_json, raw_text)
+        if next_prompt is not None:
+            current_prompt = next_prompt
+            continue
 
-            enriched = enrich_user_input_action(parsed_json)
+        return final_response, "PASS", session_id
 
-            print("  📦 Enriched user_input JSON:")
-            print(json.dumps(enriched, indent=2))
+    return "Max iterations reached", "FAIL", session_id
 
-            current_prompt = json.dumps(enriched, ensure_ascii=False)
+async def process_prompt_async(prompt: str, http: "aiohttp.ClientSession", max_loops: int = 20) -> Tuple[str, str, str]:
+    """Same loop as process_prompt, over a shared aiohttp session"""
+    session_id = await create_session_async(http)
+    print(f"  ✅ Session created: {session_id}")
+
+    current_prompt = prompt
+
+    for i in range(max_loops):
+        print(f"  🔁 Iteration {i+1}")
+        parsed_json, raw_text = await run_agent_sse_async(http, session_id, current_prompt)
+
+        next_prompt, final_response = handle_agent_reply(parsed_json, raw_text)
+        if next_prompt is not None:
+            current_prompt = next_prompt
             continue
 
-        # CASE B → FINAL
-        print("  ✅ Final response received")
-        final_response = raw_text or json.dumps(parsed_json, ensure_ascii=False)
         return final_response, "PASS", session_id
 
     return "Max iterations reached", "FAIL", session_id
 
+def handle_agent_reply(parsed_json: Optional[Any], raw_text: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Return (next_prompt, None) to resend a user_input action, or (None, final_response)"""
+    # CASE A → user_input → enrich & resend
+    if is_user_input_action(parsed_json):
+        print("  🔁 action=user_input → enriching & resending to agent")
+
+        enriched = enrich_user_input_action(parsed_json)
+
+        print("  📦 Enriched user_input JSON:")
+        print(json.dumps(enriched, indent=2))
+
+        return json.dumps(enriched, ensure_ascii=False), None
+
+    # CASE B → FINAL
+    print("  ✅ Final response received")
+    return None, raw_text or json.dumps(parsed_json, ensure_ascii=False)
+
 # ============================
 # CSV PROCESSING WITH LIVE LOGGING
 # ============================
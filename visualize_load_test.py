@@ -10,36 +10,36 @@ import json
 import glob
 from datetime import datetime
 from typing import List, Dict, Any
-
-try:
-    import matplotlib.pyplot as plt
-    import matplotlib.dates as mdates
-    MATPLOTLIB_AVAILABLE = True
-except ImportError:
-    MATPLOTLIB_AVAILABLE = False
-    print("⚠️  matplotlib not available. Install with: pip install matplotlib")
+from collections import Counter, defaultdict
 
 def find_latest_results(output_dir: str = "load_test_results") -> Dict[str, str]:
-    """Find the latest test results files"""
+    """Find the latest test results file and the resources/summary files from the same run"""
     if not os.path.exists(output_dir):
         print(f"❌ Directory not found: {output_dir}")
         return {}
     
     results_files = glob.glob(os.path.join(output_dir, "results_*.csv"))
-    resource_files = glob.glob(os.path.join(output_dir, "resources_*.csv"))
-    summary_files = glob.glob(os.path.join(output_dir, "summary_*.json"))
     
     if not results_files:
         print(f"❌ No results files found in {output_dir}")
         return {}
     
-    # Get latest files
+    # All files of one run share its timestamp. An interrupted run leaves only
+    # its results file, so match by timestamp rather than taking the newest of each type
+    results_file = max(results_files, key=os.path.getmtime)
+    timestamp = os.path.basename(results_file)[len("results_"):-len(".csv")]
+    resource_file = os.path.join(output_dir, f"resources_{timestamp}.csv")
+    summary_file = os.path.join(output_dir, f"summary_{timestamp}.json")
+    
     latest = {
-        'results': max(results_files, key=os.path.getmtime),
-        'resources': max(resource_files, key=os.path.getmtime) if resource_files else None,
-        'summary': max(summary_files, key=os.path.getmtime) if summary_files else None,
+        'results': results_file,
+        'resources': resource_file if os.path.exists(resource_file) else None,
+        'summary': summary_file if os.path.exists(summary_file) else None,
     }
     
+    if latest['resources'] is None and latest['summary'] is None:
+        print(f"⚠️  No resources or summary for {os.path.basename(results_file)} (interrupted run?)")
+    
     return latest
 
 def load_results(results_file: str) -> List[Dict[str, Any]]:
@@ -75,39 +75,40 @@ def print_text_analysis(results: List[Dict], resources: List[Dict], summary: Dic
         print(f"  Peak CPU: {summary['max_cpu_percent']:.1f}%")
         print(f"  Peak Memory: {summary['max_memory_mb']:.1f} MB")
     
-    # Latency distribution
-    latencies = [float(r['latency_seconds']) for r in results]
+    # Single pass over the rows: latencies plus per-worker [count, latency sum].
+    # Kept pure Python so text analysis needs no numpy/matplotlib.
+    latencies = []
+    worker_stats = defaultdict(lambda: [0, 0.0])
+    for r in results:
+        latency = float(r['latency_seconds'])
+        latencies.append(latency)
+        stats = worker_stats[int(r['worker_id'])]
+        stats[0] += 1
+        stats[1] += latency
+    
+    # Latency distribution: one sort, same index rule as the load test summary
+    # so P95/P99 agree with it
     latencies.sort()
+    n = len(latencies)
+    p25, p50, p75, p90, p95, p99 = (latencies[int(n * q)] for q in (0.25, 0.50, 0.75, 0.90, 0.95, 0.99))
     
     print(f"\n⏱️  LATENCY DISTRIBUTION:")
-    print(f"  Min: {min(latencies):.2f}s")
-    print(f"  25th percentile: {latencies[int(len(latencies)*0.25)]:.2f}s")
-    print(f"  50th percentile (median): {latencies[int(len(latencies)*0.50)]:.2f}s")
-    print(f"  75th percentile: {latencies[int(len(latencies)*0.75)]:.2f}s")
-    print(f"  90th percentile: {latencies[int(len(latencies)*0.90)]:.2f}s")
-    print(f"  95th percentile: {latencies[int(len(latencies)*0.95)]:.2f}s")
-    print(f"  99th percentile: {latencies[int(len(latencies)*0.99)]:.2f}s")
-    print(f"  Max: {max(latencies):.2f}s")
-    
-    # Worker performance
-    worker_stats = {}
-    for r in results:
-        worker_id = int(r['worker_id'])
-        if worker_id not in worker_stats:
-            worker_stats[worker_id] = []
-        worker_stats[worker_id].append(float(r['latency_seconds']))
+    print(f"  Min: {latencies[0]:.2f}s")
+    print(f"  25th percentile: {p25:.2f}s")
+    print(f"  50th percentile (median): {p50:.2f}s")
+    print(f"  75th percentile: {p75:.2f}s")
+    print(f"  90th percentile: {p90:.2f}s")
+    print(f"  95th percentile: {p95:.2f}s")
+    print(f"  99th percentile: {p99:.2f}s")
+    print(f"  Max: {latencies[-1]:.2f}s")
     
     print(f"\n👷 WORKER PERFORMANCE:")
-    for worker_id in sorted(worker_stats.keys()):
-        latencies = worker_stats[worker_id]
-        avg_latency = sum(latencies) / len(latencies)
-        print(f"  Worker {worker_id}: {len(latencies)} prompts, avg {avg_latency:.2f}s")
+    for worker_id in sorted(worker_stats):
+        count, latency_sum = worker_stats[worker_id]
+        print(f"  Worker {worker_id}: {count} prompts, avg {latency_sum / count:.2f}s")
     
     # Status breakdown
-    status_counts = {}
-    for r in results:
-        status = r['status']
-        status_counts[status] = status_counts.get(status, 0) + 1
+    status_counts = Counter(r['status'] for r in results)
     
     print(f"\n✅ STATUS BREAKDOWN:")
     for status, count in status_counts.items():
@@ -117,8 +118,13 @@ def print_text_analysis(results: List[Dict], resources: List[Dict], summary: Dic
 
 def create_visualizations(results: List[Dict], resources: List[Dict], output_dir: str):
     """Create visualization charts"""
-    if not MATPLOTLIB_AVAILABLE:
-        print("⚠️  Skipping visualizations (matplotlib not installed)")
+    # Imported here so text-only analysis doesn't pay matplotlib/numpy startup cost
+    try:
+        import numpy as np
+        import matplotlib.pyplot as plt
+        import matplotlib.dates as mdates
+    except ImportError:
+        print("⚠️  Skipping visualizations (matplotlib not installed). Install with: pip install matplotlib")
         return
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -150,7 +156,7 @@ def create_visualizations(results: List[Dict], resources: List[Dict], output_dir
     # 3. CPU Usage over time
     ax3 = axes[1, 0]
     if resources:
-        timestamps = [datetime.fromisoformat(r['timestamp']) for r in resources]
+        timestamps = np.array([r['timestamp'] for r in resources], dtype='datetime64[us]')
         cpu_values = [float(r['cpu_percent']) for r in resources]
         ax3.plot(timestamps, cpu_values, color='orange', linewidth=2)
         ax3.set_xlabel('Time')